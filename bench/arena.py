@@ -0,0 +1,68 @@
+import gc, zlib
+from collections import OrderedDict
+import torch
+
+# Shared, seeded input pool for op wrappers.
+# Each input is generated once on the host (float32 RNG, then cast), and every device
+# copy is made from that single host tensor, so CPU and MPS runs see identical data.
+
+def _dtype(dtype):
+    return getattr(torch, dtype) if isinstance(dtype, str) else dtype
+
+def _nbytes(t):
+    return t.numel() * t.element_size()
+
+def empty_device_cache(device: str):
+    gc.collect()
+    if device == "mps" and torch.backends.mps.is_available():
+        torch.mps.empty_cache()
+    elif device == "cuda" and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+class InputArena:
+    """LRU pool of input tensors keyed by (name, shape, dtype, layout, seed).
+
+    `budget_bytes` caps host + device copies together; least recently used
+    entries are dropped first. Returned tensors are detached aliases, so callers
+    can set requires_grad (and accumulate .grad) without touching the pooled tensor.
+    """
+
+    def __init__(self, seed=0, budget_bytes=2 << 30):
+        self.seed = seed
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict()  # key -> {device: tensor}, "cpu" is the source copy
+        self.nbytes = 0
+
+    def randn(self, shape, dtype, device, name="x", requires_grad=False,
+              memory_format=torch.contiguous_format):
+        shape = tuple(int(s) for s in shape)
+        dt = _dtype(dtype)
+        key = (name, shape, dt, memory_format, self.seed)
+        copies = self.entries.get(key)
+        if copies is None:
+            # Per-name seed offset so distinct inputs of the same shape aren't identical.
+            g = torch.Generator().manual_seed(self.seed + zlib.crc32(name.encode()))
+            host = torch.randn(shape, generator=g, dtype=torch.float32).to(dt)
+            host = host.contiguous(memory_format=memory_format)
+            copies = self.entries[key] = {"cpu": host}
+            self.nbytes += _nbytes(host)
+        self.entries.move_to_end(key)
+        dev = torch.device(device).type
+        t = copies.get(dev)
+        if t is None:
+            t = copies[dev] = copies["cpu"].to(device)
+            self.nbytes += _nbytes(t)
+        self._evict()
+        return t.detach().requires_grad_(requires_grad)
+
+    def _evict(self):
+        # The entry just used sits at the end, so it is never the one dropped.
+        while self.nbytes > self.budget_bytes and len(self.entries) > 1:
+            key = next(iter(self.entries))
+            for t in self.entries.pop(key).values():
+                self.nbytes -= _nbytes(t)
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
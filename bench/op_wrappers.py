@@ -1,58 +1,65 @@
 import torch
+from .arena import InputArena
 
 # Minimal “op callables”: closed-over inputs, no allocations inside.
+# Factories take `requires_grad` so make_callable can build training variants.
+# Random inputs come from ARENA (seeded, shared across CPU/MPS); the runner configures it.
 # Add more wrappers as you curate ops.
 
-def make_cumsum(shape, dtype, device):
-    x = torch.randn(*shape, device=device, dtype=getattr(torch, dtype))
+ARENA = InputArena()
+
+def make_cumsum(shape, dtype, device, requires_grad=False):
+    x = ARENA.randn(shape, dtype, device, requires_grad=requires_grad)
     return lambda: torch.ops.aten.cumsum.default(x, -1)
 
-def make_index_select(shape, dtype, device):
-    x = torch.randn(*shape, device=device, dtype=getattr(torch, dtype))
+def make_index_select(shape, dtype, device, requires_grad=False):
+    x = ARENA.randn(shape, dtype, device, requires_grad=requires_grad)
     idx = torch.arange(x.size(-1)//2, device=device, dtype=torch.int64)
     return lambda: torch.ops.aten.index_select.default(x, -1, idx)
 
-def make_softmax(shape, dtype, device):
-    x = torch.randn(*shape, device=device, dtype=getattr(torch, dtype))
+def make_softmax(shape, dtype, device, requires_grad=False):
+    x = ARENA.randn(shape, dtype, device, requires_grad=requires_grad)
     return lambda: torch.ops.aten._softmax.default(x, -1, False)
 
-def make_layer_norm(shape, dtype, device):
-    x = torch.randn(*shape, device=device, dtype=getattr(torch, dtype))
+def make_layer_norm(shape, dtype, device, requires_grad=False):
+    x = ARENA.randn(shape, dtype, device, requires_grad=requires_grad)
     norm = (shape[-1],)
-    w = torch.ones(*norm, device=device, dtype=getattr(torch, dtype))
-    b = torch.zeros(*norm, device=device, dtype=getattr(torch, dtype))
+    w = torch.ones(*norm, device=device, dtype=getattr(torch, dtype), requires_grad=requires_grad)
+    b = torch.zeros(*norm, device=device, dtype=getattr(torch, dtype), requires_grad=requires_grad)
     return lambda: torch.ops.aten.layer_norm.default(x, norm, w, b, 1e-5, False)
 
-def make_linalg_eigh_eigenvalues(shape, dtype, device):
+def make_linalg_eigh_eigenvalues(shape, dtype, device, requires_grad=False):
     # Ensure square (or batched square) and Hermitian. Use public API which maps to ATen.
     alloc_dtype = dtype
     if dtype in {"float16", "bfloat16"}:
         alloc_dtype = "float32"
-    x = torch.randn(*shape, device=device, dtype=getattr(torch, alloc_dtype))
+    x = ARENA.randn(shape, alloc_dtype, device)
     if x.dim() < 2 or x.size(-1) != x.size(-2):
         n = shape[-1]
-        x = torch.randn(n, n, device=device, dtype=getattr(torch, alloc_dtype))
-    a = (x + x.transpose(-1, -2)) * 0.5
+        x = ARENA.randn((n, n), alloc_dtype, device)
+    # `x` never requires grad, so `a` is a leaf and backward stops at it.
+    a = ((x + x.transpose(-1, -2)) * 0.5).requires_grad_(requires_grad)
     return lambda: torch.linalg.eigvalsh(a, UPLO='L')
 
-def make_cummin_out(shape, dtype, device):
-    x = torch.randn(*shape, device=device, dtype=getattr(torch, dtype))
+def make_cummin_out(shape, dtype, device, requires_grad=False):
+    if requires_grad:
+        raise ValueError("cummin.out writes into preallocated outputs and has no autograd formula")
+    x = ARENA.randn(shape, dtype, device)
     dim = -1
     values = torch.empty_like(x)
     indices = torch.empty_like(x, dtype=torch.int64)
     return lambda: torch.ops.aten.cummin.out(x, dim, values=values, indices=indices)
 
-def make_conv3d(shape, dtype, device):
+def make_conv3d(shape, dtype, device, requires_grad=False):
     # Expect shape [N, C, D, H, W]
     if len(shape) != 5:
         raise ValueError("conv3d expects shape [N, C, D, H, W]")
-    N, C, D, H, W = shape
-    import torch.nn as nn
-    m = nn.Conv3d(in_channels=C, out_channels=C, kernel_size=3, padding=1, bias=False)
-    m = m.to(device=device, dtype=getattr(torch, dtype))
-    x = torch.randn(N, C, D, H, W, device=device, dtype=getattr(torch, dtype))
-    m.eval()
-    return lambda: m(x)
+    C = shape[1]
+    # Same op as nn.Conv3d(C, C, 3, padding=1, bias=False), with a pooled, seeded weight
+    # instead of a freshly initialized module per case.
+    w = ARENA.randn((C, C, 3, 3, 3), dtype, device, name="weight", requires_grad=requires_grad)
+    x = ARENA.randn(shape, dtype, device, requires_grad=requires_grad)
+    return lambda: torch.ops.aten.conv3d.default(x, w, None, [1, 1, 1], [1, 1, 1])
 
 FACTORY = {
     "aten::cumsum.default":      make_cumsum,
@@ -67,7 +74,29 @@ FACTORY = {
     "nn.Conv3D":                  make_conv3d,
 }
 
-def make_callable(qualname: str, shape, dtype: str, device: str):
+# Benchmark modes:
+#   fwd      forward only (inputs do not require grad)
+#   fwd_bwd  forward + backward per call (graph is rebuilt every call, as in training)
+#   bwd      backward only, replayed over a graph built once outside the timed region
+MODES = ("fwd", "fwd_bwd", "bwd")
+
+def make_training_callable(fwd, mode: str):
+    # One untimed forward to size grad_output; also allocates the .grad buffers
+    # so later calls accumulate in place.
+    out = fwd()
+    grad_out = ARENA.randn(out.shape, out.dtype, out.device, name="grad_out")
+    if mode == "fwd_bwd":
+        out.backward(grad_out)
+        return lambda: fwd().backward(grad_out)
+    if mode == "bwd":
+        out.backward(grad_out, retain_graph=True)
+        return lambda: out.backward(grad_out, retain_graph=True)
+    raise ValueError(f"Unknown training mode {mode!r}; expected one of {MODES[1:]}")
+
+def make_callable(qualname: str, shape, dtype: str, device: str, mode: str = "fwd"):
     if qualname not in FACTORY:
         raise KeyError(f"No wrapper for {qualname}. Add to FACTORY in op_wrappers.py")
-    return FACTORY[qualname](shape, dtype, device)
+    if mode == "fwd":
+        return FACTORY[qualname](shape, dtype, device)
+    fwd = FACTORY[qualname](shape, dtype, device, requires_grad=True)
+    return make_training_callable(fwd, mode)
@@ -1,9 +1,12 @@
-import os, json, argparse, time, warnings
+import os, json, argparse, resource, time, warnings
 import yaml
 import torch
 import pandas as pd
 from torch.utils import benchmark as tb
-from .op_wrappers import make_callable
+from .arena import empty_device_cache
+from .op_wrappers import ARENA, MODES, make_callable
+from .threads import pinned_threads, usable_cores
+from .trace import ChromeTraceSink, JsonlSink, Tracer
 from ops.shapesets import defaults_for
 
 def time_callable(fn, min_run_time=1.0):
@@ -11,6 +14,72 @@ def time_callable(fn, min_run_time=1.0):
     m = t.blocked_autorange(min_run_time=min_run_time)
     return float(m.median)
 
+# Sweep-wide observer hub; attach sinks with add_observer(). No observers -> no-op hooks.
+tracer = Tracer()
+
+def add_observer(obs):
+    tracer.add(obs)
+
+def remove_observer(obs):
+    tracer.remove(obs)
+
+def _cpu_snapshot():
+    # Process-wide rusage covers intra-op pool threads; thread_time is the issuing thread only.
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    return (time.perf_counter(), ru.ru_utime, ru.ru_stime, time.thread_time(), ru.ru_nvcsw, ru.ru_nivcsw)
+
+def time_callable_with_cpu(fn, min_run_time=1.0):
+    before = _cpu_snapshot()
+    median = time_callable(fn, min_run_time)
+    wall, user, sys_, thread, vcsw, ivcsw = (a - b for a, b in zip(_cpu_snapshot(), before))
+    # blocked_autorange doesn't expose its total call count (calibration included),
+    # so scale the rates over the whole measurement to one median-length call.
+    per_call = median / wall if wall > 0 else 0.0
+    cost = {
+        "user_s": user * per_call,
+        "sys_s": sys_ * per_call,
+        "thread_s": thread * per_call,
+        "cpu_per_call_s": (user + sys_) * per_call,
+        "vcsw": vcsw * per_call,
+        "ivcsw": ivcsw * per_call,
+        "cores": (user + sys_) / wall if wall > 0 else None,
+    }
+    return median, cost
+
+def time_thread_scaling(fn, threads, case=None, pin=True):
+    # CPU baseline at each intra-op thread count; 1 is always included as the serial reference.
+    # Counts above the usable cores are skipped (and returned) rather than timed oversubscribed.
+    times = {}
+    cores = usable_cores()
+    counts = sorted(set(threads) | {1})
+    skipped = [n for n in counts if n > cores]
+    for n in counts:
+        if n in skipped:
+            continue
+        with tracer.phase(f"cpu.autorange.t{n}", case), pinned_threads(n, pin):
+            times[n] = time_callable(fn)
+    return times, skipped
+
+def scaling_columns(times, mps_s, skipped=()):
+    cols = {"threads_skipped": " ".join(map(str, skipped)) or None}
+    t1 = times[1]
+    best_n = min(times, key=times.get)
+    for n, t in times.items():
+        cols[f"time_cpu_t{n}_s"] = t
+        cols[f"speedup_t{n}"] = t1 / t
+        cols[f"efficiency_t{n}"] = t1 / t / n
+    cols["best_threads"] = best_n
+    cols["time_cpu_best_s"] = times[best_n]
+    cols["penalty_vs_1t"] = mps_s / t1 if mps_s is not None else None
+    cols["penalty_vs_best"] = mps_s / times[best_n] if mps_s is not None else None
+    return cols
+
+def synchronize(device: str):
+    if device == "mps":
+        torch.mps.synchronize()
+    elif device == "cuda":
+        torch.cuda.synchronize()
+
 def dispatch_has_mps(qualname: str) -> bool:
     try:
         tab = torch._C._dispatch_dump_table(qualname)
@@ -27,62 +96,100 @@ def dispatch_has_mps(qualname: str) -> bool:
     except Exception:
         return False
 
-def bench_qualname(qualname, shapes, dtypes):
+def bench_qualname(qualname, shapes, dtypes, modes=("fwd",), device="mps", threads=None, pin=True):
     rows = []
-    impl_mps = dispatch_has_mps(qualname)
-    for shape in shapes:
-        for dt in dtypes:
-            status = "ok"
-            err = None
-            # CPU baseline
+    with tracer.phase("dispatch_table"):
+        impl_mps = dispatch_has_mps(qualname)
+    for shape, dt, mode in ((s, d, m) for s in shapes for d in dtypes for m in modes):
+        case = {"qualname": qualname, "shape": str(shape), "dtype": dt, "mode": mode, "device": device}
+        tracer.case_start(case)
+        status = "ok"
+        err = None
+        fn_cpu = fn_mps = None
+        thread_times = None
+        # CPU baseline
+        try:
+            with tracer.phase("cpu.make_callable", case):
+                fn_cpu = make_callable(qualname, shape, dt, "cpu", mode)
+            with tracer.phase("cpu.autorange", case):
+                cpu_s, cost_cpu = time_callable_with_cpu(fn_cpu)
+        except Exception as e:
+            status = "cpu_error"
+            err = str(e)[:200]
+            cpu_s, cost_cpu = None, {}
+
+        # Optional thread sweep; a failure here only drops the scaling columns.
+        scaling_err = None
+        if threads and fn_cpu is not None and cpu_s is not None:
             try:
-                fn_cpu = make_callable(qualname, shape, dt, "cpu")
-                cpu_s = time_callable(fn_cpu)
+                thread_times, threads_skipped = time_thread_scaling(fn_cpu, threads, case, pin)
             except Exception as e:
-                status = "cpu_error"
-                err = str(e)[:200]
-                cpu_s = None
+                scaling_err = str(e)[:200]
 
-            # MPS with fallback enabled
-            mps_s = None
-            fallback_warn = None
+        # MPS with fallback enabled
+        mps_s = None
+        cost_mps = {}
+        fallback_warn = None
+        try:
+            os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1"
+            # Capture fallback warnings from construction too: training modes prime a
+            # forward+backward inside make_callable, and each warning fires only once.
+            warnings.simplefilter("always")
+            msgs = []
+            def hook(msg, *a, **k):
+                s = str(msg)
+                if "will fall back to run on the CPU" in s:
+                    msgs.append(s)
+            old = warnings.showwarning
+            warnings.showwarning = hook
             try:
-                os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1"
-                fn_mps = make_callable(qualname, shape, dt, "mps")
+                with tracer.phase("mps.make_callable", case):
+                    fn_mps = make_callable(qualname, shape, dt, device, mode)
                 # Probe once to detect fallback warning
-                warnings.simplefilter("always")
-                msgs = []
-                def hook(msg, *a, **k):
-                    s = str(msg)
-                    if "will fall back to run on the CPU" in s:
-                        msgs.append(s)
-                old = warnings.showwarning
-                warnings.showwarning = hook
-                try:
+                with tracer.phase("mps.probe", case):
                     fn_mps()
-                finally:
-                    warnings.showwarning = old
-                fallback_warn = bool(msgs)
-                torch.mps.synchronize()
-                mps_s = time_callable(fn_mps)
-                torch.mps.synchronize()
-            except Exception as e:
-                status = "mps_error" if status == "ok" else status
-                err = str(e)[:200]
-
-            rows.append({
-                "qualname": qualname,
-                "shape": str(shape),
-                "dtype": dt,
-                "time_cpu_s": cpu_s,
-                "time_mps_fallback_s": mps_s,
-                "penalty_factor": (mps_s / cpu_s if (cpu_s is not None and mps_s is not None) else None),
-                "over_ms": ((mps_s - cpu_s) * 1e3 if (cpu_s is not None and mps_s is not None) else None),
-                "implemented_mps": impl_mps,
-                "fallback_warn": fallback_warn,
-                "status": status,
-                "error": err,
-            })
+            finally:
+                warnings.showwarning = old
+            fallback_warn = bool(msgs)
+            with tracer.phase("mps.synchronize", case):
+                synchronize(device)
+            with tracer.phase("mps.autorange", case):
+                mps_s, cost_mps = time_callable_with_cpu(fn_mps)
+            with tracer.phase("mps.synchronize", case):
+                synchronize(device)
+        except Exception as e:
+            status = "mps_error" if status == "ok" else status
+            err = str(e)[:200]
+
+        row = {
+            "qualname": qualname,
+            "shape": str(shape),
+            "dtype": dt,
+            "mode": mode,
+            "time_cpu_s": cpu_s,
+            "time_mps_fallback_s": mps_s,
+            "penalty_factor": (mps_s / cpu_s if (cpu_s is not None and mps_s is not None) else None),
+            "over_ms": ((mps_s - cpu_s) * 1e3 if (cpu_s is not None and mps_s is not None) else None),
+            "implemented_mps": impl_mps,
+            "fallback_warn": fallback_warn,
+            "status": status,
+            "error": err,
+        }
+        for side, cost in (("cpu", cost_cpu), ("mps", cost_mps)):
+            for k in ("user_s", "sys_s", "thread_s", "cpu_per_call_s", "vcsw", "ivcsw", "cores"):
+                # e.g. cpu_per_call_mps_s, cores_cpu (mirrors time_cpu_s / time_mps_fallback_s)
+                name = f"{k[:-2]}_{side}_s" if k.endswith("_s") else f"{k}_{side}"
+                row[name] = cost.get(k)
+        if thread_times:
+            row.update(scaling_columns(thread_times, mps_s, threads_skipped))
+        if threads:
+            row["scaling_error"] = scaling_err
+        rows.append(row)
+        # Inputs stay pooled in ARENA; drop the callables (graphs, outputs) and the allocator cache.
+        del fn_cpu, fn_mps
+        with tracer.phase("release", case):
+            empty_device_cache(device)
+        tracer.case_end(case, status)
     return pd.DataFrame(rows)
 
 def load_targets(path):
@@ -93,22 +200,58 @@ def load_targets(path):
         raise SystemExit(f"Failed to parse YAML at {path}: {e}")
     return y["ops"]
 
+def positive_int(s):
+    n = int(s)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"thread count must be >= 1, got {n}")
+    return n
+
 def main(args):
-    assert torch.backends.mps.is_available(), "MPS not available."
+    if args.device == "mps":
+        assert torch.backends.mps.is_available(), "MPS not available."
     ops = load_targets(args.targets)
     os.makedirs(args.out_dir, exist_ok=True)
+    if args.threads and max(args.threads) > usable_cores():
+        print(f"warning: skipping thread counts above {usable_cores()} usable cores "
+              f"({sorted(n for n in args.threads if n > usable_cores())}); see threads_skipped")
+    ARENA.seed = args.seed
+    ARENA.budget_bytes = args.arena_mb << 20
+    if args.trace_chrome:
+        add_observer(ChromeTraceSink(args.trace_chrome))
+    if args.trace_jsonl:
+        add_observer(JsonlSink(args.trace_jsonl))
+    try:
+        run_sweep(ops, args)
+    finally:
+        tracer.close()
+
+def run_sweep(ops, args):
     for entry in ops:
         q = entry["qualname"]
         base = q.split("::")[1].split(".")[0]
         shapes = entry.get("shapes") or defaults_for(base)
         dtypes = entry.get("dtypes") or ["float16","float32"]
-        df = bench_qualname(q, shapes, dtypes)
+        modes = entry.get("modes") or args.modes
+        df = bench_qualname(q, shapes, dtypes, modes, device=args.device,
+                            threads=args.threads, pin=not args.no_pin)
         out = f"{args.out_dir}/{q.replace('::','_').replace('.','_')}.csv"
-        df.to_csv(out, index=False)
+        with tracer.phase("csv_write"):
+            df.to_csv(out, index=False)
         print("wrote", out)
 
 if __name__ == "__main__":
     p = argparse.ArgumentParser()
     p.add_argument("--targets", default="ops/targets.yaml")
     p.add_argument("--out_dir", default="results")
+    p.add_argument("--device", default="mps",
+                   help="device timed against the CPU baseline (cpu works for harness checks on Linux)")
+    p.add_argument("--modes", nargs="+", choices=MODES, default=["fwd"],
+                   help="fwd, fwd_bwd (training step) and/or bwd (backward only)")
+    p.add_argument("--threads", nargs="+", type=positive_int, default=None,
+                   help="also time the CPU baseline at these intra-op thread counts (e.g. 1 2 4 8)")
+    p.add_argument("--no_pin", action="store_true", help="don't pin threads to cores (Linux only)")
+    p.add_argument("--seed", type=int, default=0, help="seed for generated op inputs")
+    p.add_argument("--arena_mb", type=int, default=2048, help="byte budget (MiB) for pooled op inputs")
+    p.add_argument("--trace_chrome", default=None, help="write a Chrome trace JSON timeline of the sweep")
+    p.add_argument("--trace_jsonl", default=None, help="stream sweep events as JSON lines")
     main(p.parse_args())
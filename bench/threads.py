@@ -0,0 +1,41 @@
+import contextlib, os
+import torch
+
+# Intra-op thread control for the CPU baseline.
+# On Linux the process is also pinned to the first n allowed cores; elsewhere
+# (macOS has no affinity API) only torch's intra-op thread count changes.
+
+def _tids():
+    try:
+        return [int(t) for t in os.listdir("/proc/self/task")]
+    except OSError:
+        return [0]
+
+def _set_affinity(cpus):
+    # sched_setaffinity acts on a single thread, so walk every task, including
+    # intra-op pool threads that already exist.
+    for tid in _tids():
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except OSError:
+            pass
+
+def usable_cores() -> int:
+    # Cores this process may run on; counts above this would oversubscribe, not scale.
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+@contextlib.contextmanager
+def pinned_threads(n: int, pin: bool = True):
+    old_threads = torch.get_num_threads()
+    old_cpus = os.sched_getaffinity(0) if pin and hasattr(os, "sched_setaffinity") else None
+    try:
+        if old_cpus is not None:
+            _set_affinity(set(sorted(old_cpus)[:n]))
+        torch.set_num_threads(n)
+        yield
+    finally:
+        torch.set_num_threads(old_threads)
+        if old_cpus is not None:
+            _set_affinity(old_cpus)
@@ -0,0 +1,130 @@
+import contextlib, json, os, threading, time
+
+# Observer hooks for the bench sweep. Timestamps are time.perf_counter() seconds.
+# `case` is a small dict (qualname/shape/dtype/mode/device) or None for sweep-level phases.
+
+class Observer:
+    def case_start(self, ts, case): pass
+    def case_end(self, ts, case, status): pass
+    def phase_start(self, ts, name, case): pass
+    def phase_end(self, ts, name, case): pass
+    def error(self, ts, name, case, exc): pass
+    def close(self): pass
+
+
+class JsonlSink(Observer):
+    """Streams one JSON object per event; flushed per line so a killed run keeps its log."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.f = open(path, "w")
+
+    def _write(self, **ev):
+        self.f.write(json.dumps(ev, default=str) + "\n")
+        self.f.flush()
+
+    def case_start(self, ts, case): self._write(event="case_start", ts=ts, case=case)
+    def case_end(self, ts, case, status): self._write(event="case_end", ts=ts, case=case, status=status)
+    def phase_start(self, ts, name, case): self._write(event="phase_start", ts=ts, name=name, case=case)
+    def phase_end(self, ts, name, case): self._write(event="phase_end", ts=ts, name=name, case=case)
+
+    def error(self, ts, name, case, exc):
+        self._write(event="error", ts=ts, name=name, case=case, error=f"{type(exc).__name__}: {str(exc)[:200]}")
+
+    def close(self):
+        self.f.close()
+
+
+class ChromeTraceSink(Observer):
+    """Chrome trace (chrome://tracing, Perfetto) in JSON Array Format.
+
+    Events are streamed; the closing bracket is optional in this format, so a
+    trace from a crashed run still loads.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.f = open(path, "w")
+        self.f.write("[\n")
+        self.pid = os.getpid()
+
+    def _write(self, ph, ts, name, args=None, **extra):
+        ev = {"name": name, "ph": ph, "ts": ts * 1e6, "pid": self.pid, "tid": threading.get_ident()}
+        if args:
+            ev["args"] = args
+        ev.update(extra)
+        self.f.write(json.dumps(ev, default=str) + ",\n")
+        # Flush per event like JsonlSink: the spans just before a crash matter most.
+        self.f.flush()
+
+    @staticmethod
+    def _case_name(case):
+        return f"{case['qualname']} {case['shape']} {case['dtype']} {case['mode']}"
+
+    def case_start(self, ts, case): self._write("B", ts, self._case_name(case), case, cat="case")
+    def case_end(self, ts, case, status): self._write("E", ts, self._case_name(case), {"status": status}, cat="case")
+    def phase_start(self, ts, name, case): self._write("B", ts, name, cat="phase")
+    def phase_end(self, ts, name, case): self._write("E", ts, name, cat="phase")
+
+    def error(self, ts, name, case, exc):
+        self._write("i", ts, f"error: {name}", {"error": str(exc)[:200], **(case or {})}, cat="error", s="t")
+
+    def close(self):
+        # Metadata event doubles as a valid last element, so no trailing comma.
+        self.f.write(json.dumps({"name": "process_name", "ph": "M", "pid": self.pid,
+                                 "args": {"name": "mps-fallback-bench"}}) + "\n]\n")
+        self.f.close()
+
+
+_NULL = contextlib.nullcontext()
+
+class Tracer:
+    """Fans events out to observers. With none attached, every hook is a no-op."""
+
+    def __init__(self):
+        self.observers = []
+
+    def add(self, obs):
+        self.observers.append(obs)
+
+    def remove(self, obs):
+        self.observers.remove(obs)
+
+    def close(self):
+        for obs in self.observers:
+            obs.close()
+        self.observers.clear()
+
+    def case_start(self, case):
+        if self.observers:
+            ts = time.perf_counter()
+            for obs in self.observers:
+                obs.case_start(ts, case)
+
+    def case_end(self, case, status):
+        if self.observers:
+            ts = time.perf_counter()
+            for obs in self.observers:
+                obs.case_end(ts, case, status)
+
+    def phase(self, name, case=None):
+        if not self.observers:
+            return _NULL
+        return self._phase(name, case)
+
+    @contextlib.contextmanager
+    def _phase(self, name, case):
+        ts = time.perf_counter()
+        for obs in self.observers:
+            obs.phase_start(ts, name, case)
+        try:
+            yield
+        except Exception as e:
+            ts = time.perf_counter()
+            for obs in self.observers:
+                obs.error(ts, name, case, e)
+            raise
+        finally:
+            ts = time.perf_counter()
+            for obs in self.observers:
+                obs.phase_end(ts, name, case)
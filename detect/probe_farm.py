@@ -0,0 +1,249 @@
+import argparse, collections, importlib, json, os, selectors, subprocess, sys, time
+
+# Subprocess-isolated probe farm.
+#
+# Each worker is a fresh interpreter spawned with PYTORCH_ENABLE_MPS_FALLBACK already
+# set (the flag is only read at startup), so a worker runs either "no fallback" or
+# "fallback" probes, never both. A probe that aborts or hangs kills only its worker;
+# the farm records the failure and spawns a replacement on demand.
+#
+#   farm = ProbeFarm(workers=4, timeout=60, device="cpu")
+#   for row in farm.run(["aten::linalg_qr.out", ...]):  # yields as probes finish
+#       ...
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIELDS = ["qualname", "implemented_mps", "ran_no_fallback", "ran_with_fallback", "fallback_warn", "error"]
+
+
+def _base(qualname: str) -> str:
+    return qualname.split("::")[-1].split(".")[0]
+
+
+def _load(spec: str):
+    mod, _, name = spec.partition(":")
+    return getattr(importlib.import_module(mod), name)
+
+
+class _Worker:
+    def __init__(self, fallback: bool, device: str, dtype: str, factory: str):
+        env = dict(os.environ, PYTORCH_ENABLE_MPS_FALLBACK="1" if fallback else "0")
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (_ROOT, env.get("PYTHONPATH")) if p)
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "detect.probe_farm", "--worker",
+             "--device", device, "--dtype", dtype, "--factory", factory],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env,
+        )
+        self.buf = b""
+        self.fallback = fallback
+        self.ready = False  # set once the worker reports its imports are done
+        self.qualname = None
+        self.deadline = None
+
+    def send(self, qualname: str, timeout: float, spawn_grace: float):
+        # Until the worker is ready the clock also covers interpreter + torch startup;
+        # the per-probe timeout restarts when the ready line arrives.
+        self.qualname = qualname
+        self.deadline = time.monotonic() + timeout + (0.0 if self.ready else spawn_grace)
+        self.proc.stdin.write(json.dumps({"qualname": qualname}).encode() + b"\n")
+        self.proc.stdin.flush()
+
+    def read_messages(self):
+        # Raw os.read, not readline: a buffered reader could pull the ready line and a
+        # result in one go and leave select() waiting on an already drained pipe.
+        # Returns None at EOF (the worker died).
+        data = os.read(self.proc.stdout.fileno(), 65536)
+        if not data:
+            return None
+        *lines, self.buf = (self.buf + data).split(b"\n")
+        return [json.loads(ln) for ln in lines if ln]
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+    def kill(self):
+        self.proc.kill()
+        self.proc.wait()
+
+
+class ProbeFarm:
+    """Runs family probes in a pool of worker processes.
+
+    Every qualname is probed with fallback disabled; on error, timeout or crash it is
+    re-probed in a fallback-enabled worker. `factory` is "module:function" with
+    make_family_probe's signature (base, dtype, device).
+    """
+
+    def __init__(self, workers=4, timeout=60.0, device="mps", dtype="float32",
+                 factory="detect.probes:make_family_probe", spawn_grace=60.0):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.device = device
+        self.dtype = dtype
+        self.factory = factory
+        self.spawn_grace = spawn_grace
+
+    def run(self, qualnames):
+        fresh = collections.deque(qualnames)  # no-fallback probes, input order
+        retries = collections.deque()  # fallback re-probes, FIFO in order of failure
+        first = {}  # qualname -> no-fallback result, kept until the fallback run finishes
+        idle = {False: [], True: []}
+        busy = []
+        sel = selectors.DefaultSelector()
+        try:
+            while fresh or retries or busy:
+                done = []
+                while (fresh or retries) and len(busy) < self.workers:
+                    picked = self._next(fresh, retries, idle, busy)
+                    if picked is None:
+                        break
+                    q, w = picked
+                    try:
+                        w.send(q, self.timeout, self.spawn_grace)
+                    except OSError:
+                        # Died while idle (OOM killer, external kill): record it like a crash.
+                        w.kill()
+                        done.append((w, {"ok": False, "warn": None,
+                                         "error": f"worker crashed (exit {w.proc.returncode})"}, False))
+                        continue
+                    busy.append(w)
+                    sel.register(w.proc.stdout, selectors.EVENT_READ, w)
+
+                wait = max(0.0, min(w.deadline for w in busy) - time.monotonic()) if busy else 0.0
+                for key, _ in sel.select(wait):
+                    w = key.data
+                    msgs = w.read_messages()
+                    if msgs is None:
+                        done.append((w, {"ok": False, "warn": None,
+                                         "error": f"worker crashed (exit {w.proc.wait()})"}, False))
+                        continue
+                    for msg in msgs:
+                        if msg.get("ready"):
+                            w.ready = True
+                            w.deadline = time.monotonic() + self.timeout
+                        else:
+                            done.append((w, msg, True))
+                now = time.monotonic()
+                finished = {id(w) for w, _, _ in done}
+                for w in busy:
+                    if id(w) not in finished and w.deadline <= now:
+                        w.kill()
+                        done.append((w, {"ok": False, "warn": None,
+                                         "error": f"timeout after {self.timeout:g}s"}, False))
+
+                for w, res, alive in done:
+                    if w in busy:
+                        sel.unregister(w.proc.stdout)
+                        busy.remove(w)
+                    if alive:
+                        idle[w.fallback].append(w)
+                    q = w.qualname
+                    if not w.fallback and res["ok"] is False:
+                        first[q] = res
+                        retries.append(q)
+                        continue
+                    yield self._row(q, first.pop(q, None), res)
+        finally:
+            sel.close()
+            for w in busy:
+                w.kill()
+            for w in idle[False] + idle[True]:
+                w.close()
+
+    def _next(self, fresh, retries, idle, busy):
+        # Pick (qualname, worker) for the next job, or None to wait for a busy worker.
+        # Retries go first so failed probes complete (and stream out) promptly. Workers are
+        # expensive to start (interpreter + torch import), so an idle worker of the other
+        # kind is retired only when the wanted kind has no worker at all, or when:
+        #   - for a retry: no fresh probes remain, or the retry backlog exceeds the
+        #     fallback workers and the no-fallback side can spare one;
+        #   - for a fresh probe: no retries are pending and another fallback worker
+        #     stays warm for the next failure.
+        # The fallback pool thus grows with the backlog instead of running retries serially.
+        live = {fb: len(idle[fb]) + sum(w.fallback == fb for w in busy) for fb in (False, True)}
+        spare = live[False] + live[True] < self.workers
+        for fb, queue in ((True, retries), (False, fresh)):
+            if not queue:
+                continue
+            if idle[fb]:
+                return queue.popleft(), idle[fb].pop()
+            if spare:
+                return queue.popleft(), _Worker(fb, self.device, self.dtype, self.factory)
+            other = idle[not fb]
+            if not other:
+                continue
+            if fb:
+                retire = not fresh or (len(retries) > live[True] and live[False] > 1)
+            else:
+                retire = not retries and len(other) > 1
+            if live[fb] == 0 or retire:
+                other.pop().close()
+                return queue.popleft(), _Worker(fb, self.device, self.dtype, self.factory)
+        return None
+
+    @staticmethod
+    def _row(qualname, no_fb, res):
+        if no_fb is None:
+            # Ran cleanly without fallback (or there was no probe: ok is None).
+            return {"qualname": qualname, "ran_no_fallback": res["ok"], "ran_with_fallback": None,
+                    "fallback_warn": None, "error": None}
+        return {"qualname": qualname, "ran_no_fallback": False, "ran_with_fallback": res["ok"],
+                "fallback_warn": res["warn"], "error": res["error"] or no_fb["error"]}
+
+
+def coverage_rows(items, farm: ProbeFarm, can_probe: bool):
+    """Yield coverage CSV rows (FIELDS) for (qualname, dispatch_has_mps) pairs.
+
+    Ops without a family probe are emitted immediately; probed ops follow as the
+    farm finishes them, so the order is not the input order.
+    """
+    from detect.probes import PROBE_BASES
+
+    items = list(items)
+    impl = dict(items)
+    probed = []
+    for q, has_mps in items:
+        if can_probe and _base(q) in PROBE_BASES:
+            probed.append(q)
+            continue
+        yield {"qualname": q, "implemented_mps": has_mps, "ran_no_fallback": None,
+               "ran_with_fallback": None, "fallback_warn": None, "error": None}
+    for row in farm.run(probed):
+        ran = row["ran_no_fallback"]
+        row["implemented_mps"] = ran if ran is not None else impl[row["qualname"]]
+        yield row
+
+
+def worker_main(args):
+    # Keep the protocol on a private copy of stdout; anything torch prints goes to stderr.
+    with os.fdopen(os.dup(1), "w") as out:
+        os.dup2(2, 1)
+        from detect.probes import probe_run
+        factory = _load(args.factory)
+        out.write(json.dumps({"ready": True}) + "\n")
+        out.flush()
+        for line in sys.stdin:
+            base = _base(json.loads(line)["qualname"])
+            try:
+                fn = factory(base, args.dtype, args.device)
+                ok, warn, err = probe_run(fn) if fn is not None else (None, None, None)
+            except Exception as e:
+                ok, warn, err = False, None, str(e)
+            out.write(json.dumps({"ok": ok, "warn": warn, "error": err}) + "\n")
+            out.flush()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--worker", action="store_true", help="internal: run as a farm worker")
+    ap.add_argument("--device", default="mps")
+    ap.add_argument("--dtype", default="float32")
+    ap.add_argument("--factory", default="detect.probes:make_family_probe")
+    args = ap.parse_args()
+    if not args.worker:
+        raise SystemExit("probe_farm is started by scan_all_aten_ops.py / check_requested_ops.py")
+    worker_main(args)
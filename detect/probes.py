@@ -0,0 +1,63 @@
+import warnings
+from typing import Callable, Optional
+
+import torch
+import torch.nn.functional as F
+
+# Family probes shared by scripts/scan_all_aten_ops.py and scripts/check_requested_ops.py.
+# A probe is a zero-arg callable that exercises the op family on `device`.
+
+# Base names make_family_probe knows; lets callers skip ops without building tensors.
+PROBE_BASES = {
+    "linalg_qr", "_linalg_qr",
+    "_linalg_eigh", "linalg_eigh",
+    "unique_dim", "unique",
+    "grid_sampler_2d_backward", "grid_sampler_2d",
+}
+
+
+def make_family_probe(base: str, dtype: str = "float32", device: str = "mps") -> Optional[Callable[[], None]]:
+    dt = getattr(torch, dtype)
+
+    if base in {"linalg_qr", "_linalg_qr"}:
+        a = torch.randn(64, 32, device=device, dtype=dt)
+        return lambda: torch.linalg.qr(a, mode="reduced")
+
+    if base in {"_linalg_eigh", "linalg_eigh"}:
+        x = torch.randn(128, 128, device=device, dtype=dt)
+        a = (x + x.t()) * 0.5
+        return lambda: torch.linalg.eigvalsh(a, UPLO="L")
+
+    if base in {"unique_dim", "unique"}:
+        x = torch.randint(0, 32, (32, 32), device=device)
+        return lambda: torch.unique(x, dim=1)
+
+    if base in {"grid_sampler_2d_backward", "grid_sampler_2d"}:
+        x = torch.randn(1, 3, 16, 16, device=device, requires_grad=True)
+        grid = torch.rand(1, 8, 8, 2, device=device) * 2 - 1
+        def f():
+            y = F.grid_sample(x, grid, mode="bilinear", padding_mode="zeros", align_corners=False)
+            y.sum().backward()
+        return f
+
+    return None
+
+
+def probe_run(fn: Callable[[], None]) -> tuple[bool, Optional[bool], Optional[str]]:
+    # PYTORCH_ENABLE_MPS_FALLBACK is read once at startup, so the caller's process
+    # must already have it set; see detect.probe_farm.
+    warnings.simplefilter("always")
+    msgs = []
+    def hook(msg, *a, **k):
+        s = str(msg)
+        if "will fall back to run on the CPU" in s:
+            msgs.append(s)
+    old = warnings.showwarning
+    warnings.showwarning = hook
+    try:
+        fn()
+        return True, bool(msgs), None
+    except Exception as e:
+        return False, bool(msgs) if msgs else None, str(e)
+    finally:
+        warnings.showwarning = old
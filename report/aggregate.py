@@ -1,4 +1,4 @@
-import argparse, glob, pandas as pd
+import argparse, glob, re, pandas as pd
 from jinja2 import Template
 
 def aggregate(results_dir):
@@ -6,13 +6,17 @@ def aggregate(results_dir):
     if not frames: return pd.DataFrame()
     df = pd.concat(frames, ignore_index=True)
     df["shape"] = df["shape"].astype(str)
+    # CSVs written before training variants existed are forward-only.
+    if "mode" not in df.columns:
+        df["mode"] = "fwd"
+    df["mode"] = df["mode"].fillna("fwd")
     return df
 
 def summarize(df):
     df_ok = df
     if "status" in df.columns:
         df_ok = df[df["status"].fillna("ok") == "ok"]
-    g = df_ok.groupby("qualname").agg(
+    g = df_ok.groupby(["mode", "qualname"]).agg(
         rows=("qualname","count"),
         max_penalty=("penalty_factor","max"),
         median_penalty=("penalty_factor","median"),
@@ -20,17 +24,68 @@ def summarize(df):
     ).reset_index().sort_values("median_penalty", ascending=False)
     return g
 
+def summarize_cpu_cost(df):
+    # Host CPU burned per call (user+sys, all threads); absent in older CSVs.
+    if "cpu_per_call_mps_s" not in df.columns:
+        return pd.DataFrame()
+    df_ok = df
+    if "status" in df.columns:
+        df_ok = df[df["status"].fillna("ok") == "ok"]
+    g = df_ok.groupby(["mode", "qualname"]).agg(
+        rows=("qualname","count"),
+        cpu_ms_mps=("cpu_per_call_mps_s", lambda s: s.median() * 1e3),
+        cpu_ms_cpu=("cpu_per_call_cpu_s", lambda s: s.median() * 1e3),
+        cores_mps=("cores_mps","median"),
+        ivcsw_mps=("ivcsw_mps","median"),
+    ).reset_index().sort_values("cpu_ms_mps", ascending=False)
+    return g
+
+def summarize_thread_scaling(df):
+    # Present only when the sweep ran with --threads; one speedup/efficiency column per count.
+    counts = sorted(int(m.group(1)) for c in df.columns if (m := re.fullmatch(r"time_cpu_t(\d+)_s", c)))
+    if not counts:
+        return pd.DataFrame(), []
+    df_ok = df[df["status"].fillna("ok") == "ok"] if "status" in df.columns else df
+    df_ok = df_ok[df_ok["penalty_vs_1t"].notna()]
+    aggs = {f"speedup_t{n}": (f"speedup_t{n}", "median") for n in counts}
+    aggs.update({f"efficiency_t{n}": (f"efficiency_t{n}", "median") for n in counts})
+    g = df_ok.groupby(["mode", "qualname"]).agg(
+        rows=("qualname","count"),
+        best_threads=("best_threads","median"),
+        penalty_vs_1t=("penalty_vs_1t","median"),
+        penalty_vs_best=("penalty_vs_best","median"),
+        **aggs,
+    ).reset_index().sort_values("penalty_vs_best", ascending=False)
+    return g, counts
+
 TEMPLATE = """# MPS Fallback Bench — Summary
 
 **Environment:** {{ env }}
 
-## Top Pain (by median penalty)
+{% for mode, top in tops %}
+## Top Pain — {{ mode }} (by median penalty)
 | op | rows | median× | max× | mean over (ms) |
 |---|---:|---:|---:|---:|
 {% for _,r in top.iterrows() -%}
 | {{r.qualname}} | {{r.rows}} | {{'%.2f'%r.median_penalty}} | {{'%.2f'%r.max_penalty}} | {{'%.2f'%r.mean_over_ms}} |
 {% endfor %}
-
+{% endfor %}
+{% if cpu_cost is not none and not cpu_cost.empty %}
+## CPU cost per call (MPS+fallback, by median host CPU ms)
+| op | mode | rows | CPU ms (mps) | CPU ms (cpu) | cores (mps) | invol. ctx sw/call |
+|---|---|---:|---:|---:|---:|---:|
+{% for _,r in cpu_cost.iterrows() -%}
+| {{r.qualname}} | {{r["mode"]}} | {{r.rows}} | {{'%.3f'%r.cpu_ms_mps}} | {{'%.3f'%r.cpu_ms_cpu}} | {{'%.2f'%r.cores_mps}} | {{'%.2f'%r.ivcsw_mps}} |
+{% endfor %}
+{% endif %}
+{% if scaling is not none and not scaling.empty %}
+## CPU thread scaling (medians; speedup / efficiency vs 1 thread)
+| op | mode | rows | best threads | penalty vs 1t | penalty vs best |{% for n in counts %} t{{n}} |{% endfor %}
+|---|---|---:|---:|---:|---:|{% for n in counts %}---:|{% endfor %}
+{% for _,r in scaling.iterrows() -%}
+| {{r.qualname}} | {{r["mode"]}} | {{r.rows}} | {{'%g'%r.best_threads}} | {{'%.2f'%r.penalty_vs_1t}} | {{'%.2f'%r.penalty_vs_best}} |{% for n in counts %} {{'%.2f'%r["speedup_t%d"%n]}}× / {{'%.0f'%(100*r["efficiency_t%d"%n])}}% |{% endfor %}
+{% endfor %}
+{% endif %}
 ## Raw rows
 Total rows: {{ rows }}
 """
@@ -41,8 +96,15 @@ def main(args):
     if df.empty:
         open(args.out, "w").write("# No results")
         return
-    top = summarize(df).head(30)
-    md = Template(TEMPLATE).render(env=env, top=top, rows=len(df))
+    g = summarize(df)
+    # Forward first, then training variants, so backward penalties rank on their own.
+    order = ["fwd", "fwd_bwd", "bwd"]
+    modes = sorted(g["mode"].unique(), key=lambda m: order.index(m) if m in order else len(order))
+    tops = [(m, g[g["mode"] == m].head(30)) for m in modes]
+    cpu_cost = summarize_cpu_cost(df).head(30)
+    scaling, counts = summarize_thread_scaling(df)
+    md = Template(TEMPLATE).render(env=env, tops=tops, cpu_cost=cpu_cost,
+                                   scaling=scaling.head(30), counts=counts, rows=len(df))
     with open(args.out, "w") as f: f.write(md)
     print("wrote", args.out)
 
@@ -1,11 +1,13 @@
 import argparse
 import csv
 import os
-import warnings
-from typing import Callable, Optional
+import sys
 
 import torch
-import torch.nn.functional as F
+
+# Run as a plain script: make the repo's packages importable without an install.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detect.probe_farm import FIELDS, ProbeFarm, coverage_rows
 
 '''
 This script checks if a given operation is implemented on MPS.
@@ -36,93 +38,30 @@ def dispatch_has_mps(qualname: str) -> bool:
         return False
 
 
-def make_family_probe(base: str, dtype: str = "float32") -> Optional[Callable[[], None]]:
-    device = "mps"
-    dt = getattr(torch, dtype)
-
-    if base in {"linalg_qr", "_linalg_qr"}:
-        a = torch.randn(64, 32, device=device, dtype=dt)
-        return lambda: torch.linalg.qr(a, mode="reduced")
-
-    if base in {"_linalg_eigh", "linalg_eigh"}:
-        x = torch.randn(128, 128, device=device, dtype=dt)
-        a = (x + x.t()) * 0.5
-        return lambda: torch.linalg.eigvalsh(a, UPLO="L")
-
-    if base in {"unique_dim", "unique"}:
-        x = torch.randint(0, 32, (32, 32), device=device)
-        return lambda: torch.unique(x, dim=1)
-
-    if base in {"grid_sampler_2d_backward", "grid_sampler_2d"}:
-        x = torch.randn(1, 3, 16, 16, device=device, requires_grad=True)
-        grid = torch.rand(1, 8, 8, 2, device=device) * 2 - 1
-        def f():
-            y = F.grid_sample(x, grid, mode="bilinear", padding_mode="zeros", align_corners=False)
-            y.sum().backward()
-        return f
-
-    return None
-
-
-def probe_run(fn: Callable[[], None], fallback: Optional[bool]) -> tuple[bool, Optional[bool], Optional[str]]:
-    if fallback is not None:
-        os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1" if fallback else "0"
-    warnings.simplefilter("always")
-    msgs = []
-    def hook(msg, *a, **k):
-        s = str(msg)
-        if "will fall back to run on the CPU" in s:
-            msgs.append(s)
-    old = warnings.showwarning
-    warnings.showwarning = hook
-    try:
-        fn()
-        return True, bool(msgs), None
-    except Exception as e:
-        return False, bool(msgs) if msgs else None, str(e)
-    finally:
-        warnings.showwarning = old
-
-
-def check_ops(qualnames: list[str], out_csv: str):
-    rows = []
-    for q in qualnames:
-        base = q.split("::")[-1].split(".")[0]
-        impl = dispatch_has_mps(q)
-        fn = make_family_probe(base)
-        ran_no_fb = None
-        ran_with_fb = None
-        fb_warn = None
-        err = None
-        if fn is not None and torch.backends.mps.is_available():
-            ok0, warn0, err0 = probe_run(fn, fallback=False)
-            ran_no_fb = ok0
-            if not ok0:
-                ok1, warn1, err1 = probe_run(fn, fallback=True)
-                ran_with_fb = ok1
-                fb_warn = warn1
-                err = err1 or err0
-        impl_runtime_pref = ran_no_fb if ran_no_fb is not None else impl
-        rows.append({
-            "qualname": q,
-            "implemented_mps": impl_runtime_pref,
-            "ran_no_fallback": ran_no_fb,
-            "ran_with_fallback": ran_with_fb,
-            "fallback_warn": fb_warn,
-            "error": err,
-        })
-
+def check_ops(qualnames: list[str], out_csv: str, workers: int = 4, timeout: float = 60.0,
+              device: str = "mps"):
+    items = [(q, dispatch_has_mps(q)) for q in qualnames]
+    # Probes run in subprocess workers with the fallback env var set at spawn time.
+    can_probe = device != "mps" or torch.backends.mps.is_available()
+    farm = ProbeFarm(workers=workers, timeout=timeout, device=device)
+    n = 0
     os.makedirs(os.path.dirname(out_csv) or ".", exist_ok=True)
     with open(out_csv, "w", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        w = csv.DictWriter(f, fieldnames=FIELDS)
         w.writeheader()
-        w.writerows(rows)
-    print(f"wrote {out_csv} ({len(rows)} rows)")
+        for row in coverage_rows(items, farm, can_probe):
+            w.writerow(row)
+            f.flush()
+            n += 1
+    print(f"wrote {out_csv} ({n} rows)")
 
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--out", default="results/check_ops.csv")
+    ap.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="probe worker processes")
+    ap.add_argument("--timeout", type=float, default=60.0, help="per-probe timeout (s)")
+    ap.add_argument("--device", default="mps", help="probe device (cpu exercises the farm on Linux)")
     ap.add_argument("ops", nargs="*", default=[
         "aten::linalg_qr.out",
         "aten::_linalg_eigh.eigenvalues",
@@ -130,4 +69,4 @@ if __name__ == "__main__":
         "aten::grid_sampler_2d_backward",
     ])
     args = ap.parse_args()
-    check_ops(args.ops, args.out)
+    check_ops(args.ops, args.out, args.workers, args.timeout, args.device)
@@ -1,6 +1,9 @@
-import argparse, csv, os, warnings
+import argparse, csv, os, sys
 import torch
-import torch.nn.functional as F
+
+# Run as a plain script (`make coverage`): make the repo's packages importable without an install.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detect.probe_farm import FIELDS, ProbeFarm, coverage_rows
 
 
 def dispatch_has_mps(qualname: str) -> bool:
@@ -35,56 +38,9 @@ def iter_aten_qualnames():
             yield f"aten::{name}.{ol}"
 
 
-def make_family_probe(base: str, dtype: str = "float32"):
-    device = "mps"
-    dt = getattr(torch, dtype)
-
-    if base in {"linalg_qr", "_linalg_qr"}:
-        a = torch.randn(64, 32, device=device, dtype=dt)
-        return lambda: torch.linalg.qr(a, mode="reduced")
-
-    if base in {"_linalg_eigh", "linalg_eigh"}:
-        x = torch.randn(128, 128, device=device, dtype=dt)
-        a = (x + x.t()) * 0.5
-        return lambda: torch.linalg.eigvalsh(a, UPLO="L")
-
-    if base in {"unique_dim", "unique"}:
-        x = torch.randint(0, 32, (32, 32), device=device)
-        return lambda: torch.unique(x, dim=1)
-
-    if base in {"grid_sampler_2d_backward", "grid_sampler_2d"}:
-        x = torch.randn(1, 3, 16, 16, device=device, requires_grad=True)
-        grid = torch.rand(1, 8, 8, 2, device=device) * 2 - 1
-        def f():
-            y = F.grid_sample(x, grid, mode="bilinear", padding_mode="zeros", align_corners=False)
-            y.sum().backward()
-        return f
-
-    return None
-
-
-def probe_run(fn, fallback: bool | None):
-    if fallback is not None:
-        os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1" if fallback else "0"
-    warnings.simplefilter("always")
-    msgs = []
-    def hook(msg, *a, **k):
-        s = str(msg)
-        if "will fall back to run on the CPU" in s:
-            msgs.append(s)
-    old = warnings.showwarning
-    warnings.showwarning = hook
-    try:
-        fn()
-        return True, bool(msgs), None
-    except Exception as e:
-        return False, (bool(msgs) if msgs else None), str(e)
-    finally:
-        warnings.showwarning = old
-
-
-def scan(out_csv: str, only_missing: bool = False):
-    rows = []
+def scan(out_csv: str, only_missing: bool = False, workers: int = 4, timeout: float = 60.0,
+         device: str = "mps"):
+    items = []
     total = 0
     missing = 0
     for q in sorted(iter_aten_qualnames()):
@@ -94,45 +50,18 @@ def scan(out_csv: str, only_missing: bool = False):
             missing += 1
         if only_missing and impl:
             continue
-        ran_no_fb = None
-        ran_with_fb = None
-        fb_warn = None
-        err = None
-        if torch.backends.mps.is_available():
-            base = q.split("::")[-1].split(".")[0]
-            fn = make_family_probe(base)
-            if fn is not None:
-                ok0, warn0, err0 = probe_run(fn, fallback=False)
-                ran_no_fb = ok0
-                if not ok0:
-                    ok1, warn1, err1 = probe_run(fn, fallback=True)
-                    ran_with_fb = ok1
-                    fb_warn = warn1
-                    err = err1 or err0
-        impl_runtime_pref = ran_no_fb if ran_no_fb is not None else impl
-        rows.append({
-            "qualname": q,
-            "implemented_mps": impl_runtime_pref,
-            "ran_no_fallback": ran_no_fb,
-            "ran_with_fallback": ran_with_fb,
-            "fallback_warn": fb_warn,
-            "error": err,
-        })
+        items.append((q, impl))
 
+    # Probes run in subprocess workers (see detect/probe_farm.py); rows are written as they finish.
+    can_probe = device != "mps" or torch.backends.mps.is_available()
+    farm = ProbeFarm(workers=workers, timeout=timeout, device=device)
+    os.makedirs(os.path.dirname(out_csv) or ".", exist_ok=True)
     with open(out_csv, "w", newline="") as f:
-        w = csv.DictWriter(
-            f,
-            fieldnames=[
-                "qualname",
-                "implemented_mps",
-                "ran_no_fallback",
-                "ran_with_fallback",
-                "fallback_warn",
-                "error",
-            ],
-        )
+        w = csv.DictWriter(f, fieldnames=FIELDS)
         w.writeheader()
-        w.writerows(rows)
+        for row in coverage_rows(items, farm, can_probe):
+            w.writerow(row)
+            f.flush()
 
     print({
         "total_ops": total,
@@ -146,5 +75,8 @@ if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--out", default="results/mps_coverage.csv")
     ap.add_argument("--only_missing", action="store_true")
+    ap.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="probe worker processes")
+    ap.add_argument("--timeout", type=float, default=60.0, help="per-probe timeout (s)")
+    ap.add_argument("--device", default="mps", help="probe device (cpu exercises the farm on Linux)")
     args = ap.parse_args()
-    scan(args.out, args.only_missing)
+    scan(args.out, args.only_missing, args.workers, args.timeout, args.device)
@@ -0,0 +1,25 @@
+import os, time
+
+# Stub probe factory for tests/test_probe_farm.py, loaded in farm workers as
+# "tests.farm_stub:factory". The op base name picks the behaviour. Fallback runs
+# append "<base> <pid> <start> <end>" to $FARM_STUB_LOG so the test can check overlap.
+
+def factory(base, dtype, device):
+    fallback = os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] == "1"
+
+    if base.startswith("none"):
+        return None
+    if base.startswith("hang"):
+        return lambda: time.sleep(600)
+    if base.startswith("exit"):
+        return lambda: os._exit(3)
+
+    def f():
+        if base.startswith("fail") and not fallback:
+            raise RuntimeError("not implemented without fallback")
+        if fallback:
+            start = time.time()
+            time.sleep(2.0)  # outlasts worker startup, so a retry backlog builds up
+            with open(os.environ["FARM_STUB_LOG"], "a") as log:
+                log.write(f"{base} {os.getpid()} {start} {time.time()}\n")
+    return f
@@ -0,0 +1,77 @@
+from detect import probe_farm
+from detect.probe_farm import ProbeFarm
+
+FACTORY = "tests.farm_stub:factory"
+
+
+def _fallback_runs(log):
+    # (base, pid, start, end) for each fallback-enabled run, in start order.
+    runs = [line.split() for line in log.read_text().splitlines()]
+    return sorted(((b, pid, float(s), float(e)) for b, pid, s, e in runs), key=lambda r: r[2])
+
+
+def test_probe_farm_rows(tmp_path, monkeypatch):
+    monkeypatch.setenv("FARM_STUB_LOG", str(tmp_path / "fallback.log"))
+    qualnames = ["aten::ok0.default", "aten::fail0.default", "aten::hang.default",
+                 "aten::exit.default", "aten::none.default", "aten::ok1.default", "aten::fail1.out"]
+
+    farm = ProbeFarm(workers=2, timeout=3.0, device="cpu", factory=FACTORY)
+    rows = {r["qualname"]: r for r in farm.run(qualnames)}
+
+    assert sorted(rows) == sorted(qualnames)
+    for q in ("aten::ok0.default", "aten::ok1.default"):
+        assert rows[q]["ran_no_fallback"] is True
+        assert rows[q]["ran_with_fallback"] is None
+        assert rows[q]["error"] is None
+    for q in ("aten::fail0.default", "aten::fail1.out"):
+        assert rows[q]["ran_no_fallback"] is False
+        assert rows[q]["ran_with_fallback"] is True
+        assert rows[q]["error"] == "not implemented without fallback"
+    assert rows["aten::hang.default"]["ran_with_fallback"] is False
+    assert rows["aten::hang.default"]["error"] == "timeout after 3s"
+    assert rows["aten::exit.default"]["ran_with_fallback"] is False
+    assert rows["aten::exit.default"]["error"] == "worker crashed (exit 3)"
+    assert rows["aten::none.default"]["ran_no_fallback"] is None
+
+
+def test_probe_farm_fallback_retries_run_in_parallel(tmp_path, monkeypatch):
+    log = tmp_path / "fallback.log"
+    monkeypatch.setenv("FARM_STUB_LOG", str(log))
+    fail = [f"aten::fail{i}.default" for i in range(8)]
+    qualnames = [q for i, f in enumerate(fail) for q in (f"aten::ok{i}.default", f)]
+
+    farm = ProbeFarm(workers=4, timeout=30.0, device="cpu", factory=FACTORY)
+    rows = list(farm.run(qualnames))
+
+    assert len(rows) == len(qualnames)
+    runs = _fallback_runs(log)
+    assert sorted(r[0] for r in runs) == sorted(q.split("::")[1].split(".")[0] for q in fail)
+    assert len({pid for _, pid, _, _ in runs}) > 1
+    assert any(b[2] < a[3] for a, b in zip(runs, runs[1:])), "fallback retries never overlapped"
+
+
+def test_probe_farm_survives_worker_dying_while_idle(tmp_path, monkeypatch):
+    monkeypatch.setenv("FARM_STUB_LOG", str(tmp_path / "fallback.log"))
+    send = probe_farm._Worker.send
+    killed = []
+
+    def send_after_kill(self, qualname, timeout, spawn_grace):
+        # Kill the first reused (ready, idle) worker before writing, so the write hits a dead pipe.
+        if self.ready and not killed:
+            self.proc.kill()
+            self.proc.wait()
+            killed.append(qualname)
+        return send(self, qualname, timeout, spawn_grace)
+
+    monkeypatch.setattr(probe_farm._Worker, "send", send_after_kill)
+    qualnames = ["aten::ok0.default", "aten::ok1.default", "aten::ok2.default"]
+    farm = ProbeFarm(workers=1, timeout=30.0, device="cpu", factory=FACTORY)
+    rows = {r["qualname"]: r for r in farm.run(qualnames)}
+
+    assert sorted(rows) == qualnames
+    (victim,) = killed
+    assert rows[victim]["ran_no_fallback"] is False
+    assert rows[victim]["ran_with_fallback"] is True
+    assert rows[victim]["error"].startswith("worker crashed")
+    for q in set(qualnames) - {victim}:
+        assert rows[q]["ran_no_fallback"] is True